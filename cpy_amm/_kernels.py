@@ -0,0 +1,47 @@
+"""Scalar numeric kernels for the hot swap paths.
+
+numba is optional: when it is installed the kernels are JIT-compiled
+(with an on-disk cache so the cost is paid once), otherwise the njit
+decorator degrades to a no-op and the kernels run as plain Python.
+
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+try:  # numba is optional: fall back to pure Python when unavailable
+    from numba import njit
+except ImportError:  # pragma: no cover
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+@njit(cache=True, fastmath=True)
+def cp_swap_kernel(x: float, y: float, dx: float) -> Tuple[float, float, float]:
+    """Constant product swap of dx tokens A against reserves (x, y).
+
+    Args:
+        x (float) :
+            Reserve of tokens A before swap
+
+        y (float) :
+            Reserve of tokens B before swap
+
+        dx (float) :
+            Amount of tokens A swapped in
+
+    Returns:
+        Tuple[float, float, float] :
+            (Amount of tokens B out, Reserve of tokens A after swap,
+            Reserve of tokens B after swap)
+
+    """
+    dy = (y * dx) / (x + dx)
+    return dy, x + dx, y - dy
@@ -1,24 +1,109 @@
 from __future__ import annotations
 
+import sys
+from functools import lru_cache
 from typing import Dict, Tuple
 
 import numpy as np
 import pandas as pd
 
+from ._kernels import njit
+
+
+@njit(cache=True, fastmath=True)
+def _add_liquidity_amounts(
+    liq: float, p1: float, p2: float, x: float, y: float
+) -> Tuple[float, float]:
+    """Scalar kernel for the pro rata liquidity split."""
+    inv = liq / (p1 * x + p2 * y)
+    return inv * x, inv * y
+
+
+@njit(cache=True, fastmath=True)
+def _net_order_size(order_size: float, inv_one_plus_fee: float) -> float:
+    """Scalar kernel for the net order size after transaction fees."""
+    return order_size * inv_one_plus_fee
+
 
 class Pool:
     """A class that represents a liquidity pool."""
 
-    def __init__(self, ticker: str, initial_deposit: float):
+    __slots__ = (
+        "ticker",
+        "max_history",
+        "_cap",
+        "_res",
+        "_n",
+        "_head",
+        "_seq",
+        "_initial",
+    )
+
+    def __init__(
+        self, ticker: str, initial_deposit: float, max_history: int | None = None
+    ):
         """Initializes a new instance of the Pool class.
 
         Args:
             ticker (str): The ticker for the coin in the pool.
             initial_deposit (float): The initial deposit to the pool.
+            max_history (int): Optional bound on the reserve history.
+                When set, the history becomes a ring buffer keeping only
+                the last max_history values, so memory stays constant on
+                long simulations.
 
         """
-        self.ticker = ticker
-        self.reserves = [float(initial_deposit)]
+        self.ticker = sys.intern(ticker)
+        # reserves are stored in a preallocated float64 buffer with a write
+        # cursor so appends don't box one PyFloat per simulation step
+        self.max_history = max_history
+        self._cap = max_history if max_history is not None else 64
+        self._res = np.empty(self._cap, dtype=np.float64)
+        self._res[0] = initial_deposit
+        self._initial = float(initial_deposit)
+        self._n = 1
+        # index of the oldest value once the ring buffer has wrapped
+        self._head = 0
+        # monotonic append counter; unlike (_n, _head) it never repeats,
+        # so caches keyed on it cannot go stale on a wrapped ring buffer
+        self._seq = 0
+
+    def _append(self, value: float):
+        """Appends a new reserve value.
+
+        Unbounded pools grow their buffer geometrically; bounded pools
+        wrap around and overwrite the oldest value in place.
+
+        Args:
+            value (float): The new reserve value.
+
+        """
+        self._seq += 1
+        if self._n == self._cap:
+            if self.max_history is None:
+                self._cap *= 2
+                self._res = np.resize(self._res, self._cap)
+            else:
+                self._res[self._head] = value
+                self._head = (self._head + 1) % self._cap
+                return
+        self._res[self._n] = value
+        self._n += 1
+
+    @property
+    def reserves(self) -> np.ndarray:
+        """The reserve history, oldest value first.
+
+        A zero-copy float64 view, except for a wrapped ring buffer
+        where the values are rotated back into order.
+
+        Returns:
+            np.ndarray: The reserve history of the pool.
+
+        """
+        if self._head == 0:
+            return self._res[: self._n]
+        return np.roll(self._res, -self._head)
 
     @property
     def balance(self) -> float:
@@ -28,8 +113,9 @@ class Pool:
             float: The current balance of the pool.
 
         """
-        assert len(self.reserves) > 0
-        return self.reserves[-1]
+        if self._head:
+            return self._res[self._head - 1]
+        return self._res[self._n - 1]
 
     @property
     def initial_deposit(self) -> float:
@@ -39,28 +125,37 @@ class Pool:
             float: The initial deposit made to the pool.
 
         """
-        assert len(self.reserves) > 0
-        return self.reserves[0]
+        return self._initial
 
 
+@lru_cache(maxsize=1024)
 def split_ticker(trading_pair: str) -> Tuple[str, str]:
     """Splits a trading pair ticker into base and quote tickers.
 
+    The same handful of pairs recur on every quote, order and lookup, so
+    results are memoized keyed on the raw pair string.
+
     Args:
         trading_pair (str): The trading pair in the format 'BASE/QUOTE'.
 
     Returns:
         Tuple[str, str]: A tuple of the base and quote tickers.
 
+    Raises:
+        ValueError: If the trading pair is not in 'BASE/QUOTE' format.
+
     """
-    assert trading_pair.count("/") == 1
-    base_quote = trading_pair.split("/")
-    return base_quote[0], base_quote[1]
+    idx = trading_pair.find("/")
+    if idx < 0 or "/" in trading_pair[idx + 1 :]:
+        raise ValueError(f"Invalid trading pair {trading_pair}")
+    return sys.intern(trading_pair[:idx]), sys.intern(trading_pair[idx + 1 :])
 
 
 class MarketQuote:
     """Represents a quote for the market price of a trading pair."""
 
+    __slots__ = ("token_base", "token_quote", "price", "ticker")
+
     def __init__(self, trading_pair: str, price: float):
         """Initializes a new instance of the MarketQuote class.
 
@@ -73,16 +168,9 @@ class MarketQuote:
         self.token_base = base
         self.token_quote = quote
         self.price = price
-
-    @property
-    def ticker(self) -> str:
-        """Retrieves the ticker for the trading pair.
-
-        Returns:
-            str: The ticker for the trading pair in 'BASE/QUOTE' format.
-
-        """
-        return f"{self.token_base}/{self.token_quote}"
+        # cached and interned so repeated accesses don't rebuild the
+        # f-string and compares can short-circuit on identity
+        self.ticker = sys.intern(f"{self.token_base}/{self.token_quote}")
 
     def __str__(self) -> str:
         """Returns a string representation of the MarketQuote instance.
@@ -107,22 +195,53 @@ class MarketQuote:
 class MarketPair:
     """A Market pair managing a liquidity pool made up of reserves of two tokens."""
 
-    def __init__(self, pool_1: Pool, pool_2: Pool, swap_fee: float, mkt_price: float):
+    __slots__ = (
+        "pool_1",
+        "pool_2",
+        "swap_fee",
+        "_inv_one_plus_fee",
+        "mkt_price_0",
+        "mkt_price",
+        "total_fees_quote",
+        "volume_base",
+        "volume_quote",
+        "ticker",
+        "inverse_ticker",
+        "_fee_cap",
+        "_fees",
+        "_fee_n",
+        "_fee_cols",
+        "_k",
+        "_k_state",
+    )
+
+    def __init__(
+        self,
+        pool_1: Pool,
+        pool_2: Pool,
+        swap_fee: float = 0.0,
+        mkt_price: float | None = None,
+    ):
         """Initializes a new instance of the MarketPair class.
 
         Args:
             pool_1 (Pool): The first pool.
             pool_2 (Pool): The second pool.
-            swap_fee (float): The swap fee.
+            swap_fee (float): The swap fee. Defaults to 0.
             mkt_price (float): The market price.
+                Defaults to the mid price of the pools.
 
         """
+        if mkt_price is None:
+            mkt_price = pool_1.balance / pool_2.balance
         # The ongoing reserves of the pool
         self.pool_1 = pool_1
         # The ongoing reserves of the pool
         self.pool_2 = pool_2
         # The swap fee
         self.swap_fee = swap_fee
+        # Cached reciprocal so per-order fee math is a multiply, not a divide
+        self._inv_one_plus_fee = 1.0 / (1.0 + swap_fee)
         # The market price
         self.mkt_price_0 = mkt_price
         # The market price
@@ -133,21 +252,32 @@ class MarketPair:
         self.volume_base = float(0)
         # The market price
         self.volume_quote = float(0)
-
-    @property
-    def ticker(self) -> str:
-        """Ticker for the trading pair represented by this market."""
-        return f"{self.pool_2.ticker}/{self.pool_1.ticker}"
-
-    @property
-    def inverse_ticker(self) -> str:
-        """Ticker for the inverse trading pair represented by this market."""
-        return f"{self.pool_1.ticker}/{self.pool_2.ticker}"
+        # Tickers for the trading pair and its inverse, cached and
+        # interned so the hot lookup paths don't rebuild f-strings and
+        # the == compares in get_reserves are pointer-equal
+        self.ticker = sys.intern(f"{pool_2.ticker}/{pool_1.ticker}")
+        self.inverse_ticker = sys.intern(f"{pool_1.ticker}/{pool_2.ticker}")
+        # Per-swap transaction fees, stored column-wise (one column per
+        # pool) in a preallocated float64 buffer with a write cursor
+        self._fee_cap = 64
+        self._fees = np.zeros((self._fee_cap, 2), dtype=np.float64)
+        self._fee_n = 0
+        self._fee_cols = {pool_1.ticker: 0, pool_2.ticker: 1}
+        # Cached constant product invariant, keyed on the reserve write
+        # cursors so any append invalidates it
+        self._k = None
+        self._k_state = (0, 0)
 
     @property
     def cp_invariant(self) -> float:
         """The constant product invariant."""
-        return self.pool_1.balance * self.pool_2.balance
+        # the write cursors alone go stale once a bounded pool wraps, so
+        # the ring heads are part of the key too
+        state = (self.pool_1._seq, self.pool_2._seq)
+        if self._k is None or self._k_state != state:
+            self._k = self.pool_1.balance * self.pool_2.balance
+            self._k_state = state
+        return self._k
 
     @property
     def mid_price_0(self) -> float:
@@ -251,6 +381,34 @@ class MarketPair:
         """ROI of the LP portfolio."""
         return self.pnl / self.hodl_value
 
+    @property
+    def transaction_fees(self) -> Dict[str, np.ndarray]:
+        """Per-pool transaction fee history as zero-copy float64 views.
+
+        Returns:
+            Dict[str, np.ndarray]: The recorded fees keyed by pool ticker.
+
+        """
+        return {
+            ticker: self._fees[: self._fee_n, col]
+            for ticker, col in self._fee_cols.items()
+        }
+
+    def record_fee(self, ticker: str, amount: float):
+        """Records a transaction fee paid in the pool identified by ticker.
+
+        Args:
+            ticker (str): The ticker of the pool the fee was paid in.
+            amount (float): The fee amount.
+
+        """
+        if self._fee_n == self._fee_cap:
+            self._fee_cap *= 2
+            self._fees = np.resize(self._fees, (self._fee_cap, 2))
+        self._fees[self._fee_n] = 0.0
+        self._fees[self._fee_n, self._fee_cols[ticker]] = amount
+        self._fee_n += 1
+
     def describe(self) -> Dict[str, float]:
         """Describes the market pair.
 
@@ -279,6 +437,36 @@ class MarketPair:
             "mkt_price_ratio": self.mkt_price_ratio,
         }
 
+    def describe_into(self, cols: Dict[str, list]):
+        """Appends the market pair description to columnar accumulators.
+
+        Columnar counterpart of describe() for the simulation hot loop:
+        values are appended straight to per-column lists instead of being
+        boxed into one dict per trade.
+
+        Args:
+            cols (Dict[str, list]): The per-column lists to append to.
+
+        """
+        cols["mid_price"].append(self.mid_price)
+        cols["mkt_price"].append(self.mkt_price)
+        cols["spread"].append(self.spread)
+        cols["avg_price"].append(self.avg_price)
+        cols["current_base"].append(self.pool_2.balance)
+        cols["current_quote"].append(self.pool_1.balance)
+        cols["cp_invariant"].append(self.cp_invariant)
+        cols["total_fees_paid_quote"].append(self.total_fees_quote)
+        cols["total_volume_base"].append(self.volume_base)
+        cols["total_volume_quote"].append(self.volume_quote)
+        cols["asset_base_pct"].append(self.asset_base / self.value)
+        cols["hold_portfolio"].append(self.hodl_value)
+        cols["current_portfolio"].append(self.value)
+        cols["trade_pnl"].append(self.trade_pnl)
+        cols["total_pnl"].append(self.pnl)
+        cols["roi"].append(self.roi)
+        cols["impermanent_loss"].append(self.impermanent_loss)
+        cols["mkt_price_ratio"].append(self.mkt_price_ratio)
+
     def assets(self) -> pd.DataFrame:
         """Calculates assets of the market pair.
 
@@ -361,7 +549,7 @@ class MarketPair:
                 (Liquidity pool 1, Liquidity pool 2)
 
         Raises:
-            Exception: If the trading pair is unknown.
+            ValueError: If the trading pair is unknown.
 
         """
         if trading_pair == self.ticker:
@@ -369,7 +557,7 @@ class MarketPair:
         elif trading_pair == self.inverse_ticker:
             return self.pool_2.balance, self.pool_1.balance
         else:
-            raise Exception(f"Unknown trading pair {trading_pair}")
+            raise ValueError("Unknown trading pair " + trading_pair)
 
     def add_liquidity(
         self, liq_amount: float, quote_1: MarketQuote, quote_2: MarketQuote
@@ -392,11 +580,14 @@ class MarketPair:
         """
         x = self.pool_1.balance
         y = self.pool_2.balance
-        alpha = (quote_1.price * x) / (quote_1.price * x + quote_2.price * y)
-        liq_amount_1 = liq_amount * alpha / quote_1.price
-        liq_amount_2 = liq_amount * (1 - alpha) / quote_2.price
-        self.pool_1.reserves.append(x + liq_amount_1)
-        self.pool_2.reserves.append(y + liq_amount_2)
+        # algebraically equivalent to splitting pro rata by quote value
+        # (liq * alpha / price_1 and liq * (1 - alpha) / price_2) but with
+        # a single division instead of three
+        liq_amount_1, liq_amount_2 = _add_liquidity_amounts(
+            liq_amount, quote_1.price, quote_2.price, x, y
+        )
+        self.pool_1._append(x + liq_amount_1)
+        self.pool_2._append(y + liq_amount_2)
 
 
 def with_mkt_price(mkt, mkt_price):
@@ -443,14 +634,52 @@ def new_market(
 class TradeOrder:
     """A trade order for a swap to execute."""
 
-    def __init__(self, trading_pair: str, order_size: float, transaction_fees: float):
-        self.ticker = trading_pair
+    __slots__ = (
+        "ticker",
+        "order_size",
+        "direction",
+        "net_order_size",
+        "cash_transaction_fee",
+    )
+
+    def __init__(
+        self,
+        trading_pair: str,
+        order_size: float,
+        transaction_fees: float,
+        inv_one_plus_fee: float | None = None,
+    ):
+        self.assign(trading_pair, order_size, transaction_fees, inv_one_plus_fee)
+
+    def assign(
+        self,
+        trading_pair: str,
+        order_size: float,
+        transaction_fees: float,
+        inv_one_plus_fee: float | None = None,
+    ):
+        """Re-initializes the order in place.
+
+        Lets hot loops mutate one reusable instance instead of
+        allocating a TradeOrder per trade.
+
+        Args:
+            trading_pair (str): The trading pair ticker, e.g., 'ETH/USD'.
+            order_size (float): The signed order size.
+            transaction_fees (float): The transaction fees.
+            inv_one_plus_fee (float): Optional cached 1 / (1 + fees).
+
+        """
+        self.ticker = sys.intern(trading_pair)
         # the order size
         self.order_size = abs(order_size)
         # the direction of the order
         self.direction = "buy" if order_size > 0 else "sell"
-        # the order size minus transaction fees
-        self.net_order_size = self.order_size / (1.0 + transaction_fees)
+        # the order size minus transaction fees, computed with the cached
+        # reciprocal when the caller provides one (see MarketPair)
+        if inv_one_plus_fee is None:
+            inv_one_plus_fee = 1.0 / (1.0 + transaction_fees)
+        self.net_order_size = _net_order_size(self.order_size, inv_one_plus_fee)
         # the trannsaction fees
         self.cash_transaction_fee = transaction_fees * self.order_size
 
@@ -465,4 +694,9 @@ class TradeOrder:
     @classmethod
     def create_default(cls, mkt: MarketPair) -> TradeOrder:
         """Default order equal to 10% of the first pool."""
-        return cls(mkt.ticker, 0.1 * mkt.pool_1.balance, mkt.swap_fee)
+        return cls(
+            mkt.ticker,
+            0.1 * mkt.pool_1.balance,
+            mkt.swap_fee,
+            inv_one_plus_fee=mkt._inv_one_plus_fee,
+        )
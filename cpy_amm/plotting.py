@@ -1,27 +1,33 @@
+from __future__ import annotations
+
 from copy import deepcopy
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import numpy as np
 import pandas as pd
 import scipy
-from bokeh.io import show
-from bokeh.layouts import layout
-from bokeh.models import ColumnDataSource, Div, HoverTool, NumeralTickFormatter, Span
-from bokeh.plotting import Figure, figure
-from bokeh.transform import dodge
 from statsmodels.tsa.vector_ar.vecm import coint_johansen
 
 from .market import MarketPair, Pool, TradeOrder, split_ticker
 from .simulation import swap_simulation
+from .strategy import get_strategy
 from .swap import (
     MidPrice,
     constant_product_curve,
     constant_product_swap,
     order_book,
     price_impact_range,
+    price_impact_range_closed_form,
 )
 from .utils import figure_specialization, format_df, resample, timer_func
 
+if TYPE_CHECKING:
+    from bokeh.plotting import Figure, figure  # noqa: F401
+
+# bokeh imports are deferred into the figure builders: registering its
+# model classes takes hundreds of ms and headless simulation code that
+# imports this package never pays for it
+
 
 def new_constant_product_figure(
     mkt: MarketPair,
@@ -31,6 +37,7 @@ def new_constant_product_figure(
     bokeh_figure: Figure | None = None,
     plot_width=900,
     plot_height=600,
+    xy: tuple | None = None,
 ):
     """Plots the constant product AMM curve Y = K / X
 
@@ -63,6 +70,7 @@ def new_constant_product_figure(
             Height of the plot
 
     """
+    from bokeh.plotting import figure
     p = bokeh_figure or figure(
         title=f"Constant Product AMM Curve for the pair {mkt.ticker}",
         plot_width=plot_width,
@@ -70,7 +78,9 @@ def new_constant_product_figure(
     )
     p.xaxis.axis_label = f"Amount {mkt.pool_1.ticker}"
     p.yaxis.axis_label = f"Amount {mkt.pool_2.ticker}"
-    x, y = constant_product_curve(mkt, x_min=x_min, x_max=x_max, num=num)
+    x, y = xy if xy is not None else constant_product_curve(
+        mkt, x_min=x_min, x_max=x_max, num=num
+    )
     p.line(x, y, line_width=2, color="navy", alpha=0.6, legend_label="Y=K/X")
     # display current mid price of the pools
     p = with_price_info(
@@ -91,6 +101,7 @@ def new_price_impact_figure(
     bokeh_figure: Figure | None = None,
     plot_width=900,
     plot_height=600,
+    xy: tuple | None = None,
 ):
     """Plots the constant product AMM curve with price impact range for the oder of size
     dx.
@@ -128,10 +139,14 @@ def new_price_impact_figure(
 
     """
     p = new_constant_product_figure(
-        mkt, x_min, x_max, num, bokeh_figure, plot_width, plot_height
+        mkt, x_min, x_max, num, bokeh_figure, plot_width, plot_height, xy=xy
     )
-    # coomputes price impact range
-    price_impact = price_impact_range(mkt, order, precision=precision)
+    # coomputes price impact range, closed form unless a precision is
+    # requested for the invariant checks
+    if precision is None:
+        price_impact = price_impact_range_closed_form(mkt, order)
+    else:
+        price_impact = price_impact_range(mkt, order, precision=precision)
     # plot price impact range
     p.line(
         [price_impact.start.x, price_impact.end.x],
@@ -153,6 +168,7 @@ def new_order_book_figure(
     num: int | None = None,
     plot_width=900,
     plot_height=600,
+    xy: tuple | None = None,
 ):
     """Plots the cumulative quantity at any mid price according to the formula from the
     paper "Order Book Depth and Liquidity Provision in Automated Market Makers. Orders
@@ -187,6 +203,7 @@ def new_order_book_figure(
             Height of the plot
 
     """
+    from bokeh.plotting import figure
     p = figure(
         title=f"Constant Product AMM Depth for the pair {mkt.ticker}",
         plot_width=plot_width,
@@ -194,18 +211,27 @@ def new_order_book_figure(
     )
     p.xaxis.axis_label = f"{mkt.ticker} Mid Price"
     p.yaxis.axis_label = "Order Size"
-    x, mid, q = order_book(mkt, x_min=x_min, x_max=x_max, num=num)
-    bid = [q_i if x_i < mkt.pool_1.initial_deposit else 0 for (x_i, q_i) in zip(x, q)]
-    ask = [q_i if x_i > mkt.pool_1.initial_deposit else 0 for (x_i, q_i) in zip(x, q)]
-    source = ColumnDataSource(data={"mid": mid, "bid": bid, "ask": ask})
+    x, mid, q = order_book(mkt, x_min=x_min, x_max=x_max, num=num, xy=xy)
+    # x is sorted, so one binary search splits the book at the initial
+    # deposit: below is the bid side, above the ask side. The two sides
+    # are plotted as half-length areas instead of zero-padded stacks.
+    idx = np.searchsorted(x, mkt.pool_1.initial_deposit)
     # depth eg. binance style order book
-    p.varea_stack(
-        ["bid", "ask"],
-        x="mid",
-        color=("green", "red"),
-        source=source,
+    p.varea(
+        x=mid[:idx],
+        y1=0,
+        y2=q[:idx],
+        color="green",
         alpha=0.4,
-        legend_label=["Bid", "Ask"],
+        legend_label="Bid",
+    )
+    p.varea(
+        x=mid[idx:],
+        y1=0,
+        y2=q[idx:],
+        color="red",
+        alpha=0.4,
+        legend_label="Ask",
     )
     p.x_range.range_padding = 0
     p.y_range.range_padding = 0
@@ -234,12 +260,19 @@ def new_pool_figure(
             Height of the plot
 
     """
+    from bokeh.models import ColumnDataSource
+    from bokeh.plotting import figure
+    from bokeh.transform import dodge
     TOOLTIPS = [
         (f"{pool_1.ticker}", f"@{pool_1.ticker}" + "{0,0.000}"),
         (f"{pool_2.ticker}", f"@{pool_2.ticker}" + "{0,0.000}"),
     ]
 
-    steps = steps if steps else range(len(pool_1.reserves))
+    n = len(pool_1.reserves)
+    steps = steps if steps is not None else np.arange(n)
+    # the categorical x_range wants strings: convert once up front
+    # rather than letting bokeh re-encode every value
+    steps = list(map(str, steps))
     p = figure(
         title="Pool balance history",
         plot_width=plot_width,
@@ -253,8 +286,8 @@ def new_pool_figure(
     p.xgrid.grid_line_color = None
     source = ColumnDataSource(
         data={
-            pool_1.ticker: pool_1.reserves,
-            pool_2.ticker: pool_2.reserves,
+            pool_1.ticker: np.asarray(pool_1.reserves, dtype=np.float64),
+            pool_2.ticker: np.asarray(pool_2.reserves, dtype=np.float64),
             "steps": steps,
         }
     )
@@ -276,12 +309,50 @@ def new_pool_figure(
         color="red",
         legend_label=f"{pool_2.ticker} Pool",
     )
+    # kept on the figure so dashboard loops can stream new steps into
+    # the existing source instead of rebuilding the figure
+    p._pool_source = source
     return p
 
 
+def append_pool_step(source, pool_1: Pool, pool_2: Pool, step_label):
+    """Streams one simulation step into an existing pool figure source.
+
+    For dashboards that redraw after every simulation step: streaming
+    sends only the new row over the wire (with a bounded rollover)
+    instead of rebuilding the whole ColumnDataSource. The source of a
+    pool figure is available as its _pool_source attribute.
+
+    Args:
+        source (ColumnDataSource):
+            Data source of the pool figure to update
+
+        pool_1 (Pool):
+            Liquidity pool 1
+
+        pool_2 (Pool):
+            Liquidity pool 2
+
+        step_label :
+            Label of the new step on the x-axis
+
+    """
+    source.stream(
+        {
+            pool_1.ticker: [pool_1.balance],
+            pool_2.ticker: [pool_2.balance],
+            "steps": [step_label],
+        },
+        rollover=10000,
+    )
+
+
 def plot_asset_reserves(
     df_sim, pool_1_ticker, pool_2_ticker, steps, plot_width=900, plot_height=600
 ):
+    from bokeh.models import ColumnDataSource
+    from bokeh.plotting import figure
+    from bokeh.transform import dodge
     TOOLTIPS = [
         (f"{pool_1_ticker}", f"@{pool_1_ticker}" + "{0,0.000}"),
         (f"{pool_2_ticker}", f"@{pool_2_ticker}" + "{0,0.000}"),
@@ -331,8 +402,8 @@ def new_asset_figure(mkt, df_sim, plot_width=900, plot_height=600):
     df_sim_daily, steps = resample(
         df_sim,
         {
-            "asset_base_pct": np.mean,
-            "asset_quote_pct": np.mean,
+            "asset_base_pct": "mean",
+            "asset_quote_pct": "mean",
         },
     )
     return plot_asset_reserves(
@@ -347,13 +418,18 @@ def new_asset_figure(mkt, df_sim, plot_width=900, plot_height=600):
 
 def with_price_info(p, mid: MidPrice, price_label: str) -> figure:
     """Hover tool with price info for the given point."""
-    point_id = str(hash(str(mid.x) + str(mid.y)))
+    from bokeh.models import HoverTool
+
+    # monotonically increasing id per figure, cheaper than hashing the
+    # stringified coordinates
+    pid = getattr(p, "_cpy_amm_pid", 0) + 1
+    p._cpy_amm_pid = pid
+    point_id = f"pt{pid}"
     p.circle([mid.x], [mid.y], size=10, color="red", alpha=0.4, name=point_id)
-    # use hover tool to display info
-    hover = p.select(dict(type=HoverTool, names=[point_id]))
-    if not hover:
-        hover = HoverTool(names=[point_id])
-        p.add_tools(hover)
+    # point ids are unique per call, so the hover tool is always new:
+    # no need for a p.select scan over the figure's models
+    hover = HoverTool(names=[point_id])
+    p.add_tools(hover)
     hover.tooltips = [
         (f"{mid.x_ticker}", f"{mid.x:.3f}"),
         (f"{mid.y_ticker}", f"{mid.y:.3f}"),
@@ -403,6 +479,7 @@ def format_cointegration_result(result):
 
 @timer_func
 def plot_price_ratio(df1, df2, symbol1, symbol2):
+    from bokeh.plotting import figure
     price_ratio = df1["price"].astype(float) / df2["price"].astype(float)
     mean_price_ratio = np.mean(price_ratio)
 
@@ -426,6 +503,7 @@ def plot_price_ratio(df1, df2, symbol1, symbol2):
 
 @timer_func
 def plot_scatterplot(df1, df2, symbol1, symbol2, n_points=1000):
+    from bokeh.plotting import figure
     # Calculate the number of data points in the dataset
     n_data = len(df1)
     n_points = min(n_data, n_points)
@@ -454,6 +532,8 @@ def plot_scatterplot(df1, df2, symbol1, symbol2, n_points=1000):
 
 @timer_func
 def new_trade_figure(df_1, df_2, df_composite, ticker):
+    from bokeh.layouts import layout
+    from bokeh.models import Div
     symbol_1, symbol_2 = split_ticker(ticker)
     coint_res = find_cointegrated_pairs(df_1, df_2)
     title_text = (
@@ -485,6 +565,8 @@ def new_trade_figure(df_1, df_2, df_composite, ticker):
 
 
 def new_simulation_figure(mkt, simul, plot_width=900, plot_height=600):
+    from bokeh.layouts import layout
+    from bokeh.models import Div
     df_sim = simul["breakdown"]
     title_text = (
         f"{mkt.ticker} Simulation between {df_sim.index.min()} and {df_sim.index.max()}"
@@ -551,6 +633,7 @@ def new_simulation_figure(mkt, simul, plot_width=900, plot_height=600):
 
 
 def new_df_div(df, plot_width=900, plot_height=600):
+    from bokeh.models import Div
     return Div(text=format_df(df))
     # return Div(text=format_df(df),width=plot_width, height=plot_height)
 
@@ -566,6 +649,8 @@ def new_curve_figure(
     plot_width=900,
     plot_height=600,
 ):
+    from bokeh.models import HoverTool, NumeralTickFormatter
+    from bokeh.plotting import figure
     p = figure(
         title=title,
         x_axis_type="datetime",
@@ -615,6 +700,8 @@ def new_fitted_curve_figure(
     plot_width: int = 900,
     plot_height: int = 600,
 ):
+    from bokeh.models import NumeralTickFormatter, Span
+    from bokeh.plotting import figure
     p = figure(
         title=title,
         plot_width=plot_width,
@@ -668,6 +755,8 @@ def new_distrib_figure(
     plot_width=900,
     plot_height=600,
 ):
+    from bokeh.models import HoverTool
+    from bokeh.plotting import figure
     if y_cols is None:
         y_cols = []
 
@@ -1126,7 +1215,11 @@ def cp_amm_autoviz(
             Else, 1 plot per row is displayed
 
     """
+    from bokeh.io import show
+    from bokeh.layouts import layout
     order = order or TradeOrder.create_default(mkt)
+    # sample the hyperbola once and share it across the figures
+    xy = constant_product_curve(mkt, x_min=x_min, x_max=x_max, num=num)
     p1 = new_constant_product_figure(
         mkt,
         plot_width=plot_width,
@@ -1134,6 +1227,7 @@ def cp_amm_autoviz(
         x_min=x_min,
         x_max=x_max,
         num=num,
+        xy=xy,
     )
     p2 = new_price_impact_figure(
         mkt,
@@ -1144,6 +1238,7 @@ def cp_amm_autoviz(
         x_min=x_min,
         x_max=x_max,
         num=num,
+        xy=xy,
     )
     swap_mkt = deepcopy(mkt)
     constant_product_swap(swap_mkt, order, precision=precision)
@@ -1154,9 +1249,13 @@ def cp_amm_autoviz(
         plot_width=plot_width,
         plot_height=plot_height,
     )
-    p4 = new_order_book_figure(mkt, plot_width=plot_width, plot_height=plot_height)
+    p4 = new_order_book_figure(
+        mkt, plot_width=plot_width, plot_height=plot_height, xy=xy
+    )
     if df_trades is not None:
-        simul = swap_simulation(mkt, df_trades, is_arb_enabled=True)
+        simul = swap_simulation(
+            mkt, df_trades, get_strategy("uni_v2"), is_arb_enabled=True
+        )
         show(
             new_simulation_figure(
                 mkt, simul, plot_width=plot_width, plot_height=plot_height
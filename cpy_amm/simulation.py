@@ -1,5 +1,6 @@
 import gc
-from typing import Callable, List
+from collections import defaultdict
+from typing import Callable
 
 import numpy as np
 import pandas as pd
@@ -19,14 +20,16 @@ def resample_df(df: pd.DataFrame, resample_freq: str) -> pd.DataFrame:
         pd.DataFrame: The resampled DataFrame.
 
     """
+    # string aliases route to the Cython aggregators; passing the numpy
+    # callables would go through the generic apply path
     df = df.resample(resample_freq).agg(
         {
-            "marketprice": np.mean,
-            "buy_volume": np.sum,
-            "sell_volume": np.sum,
-            "fx_pnl": np.mean,
-            "closeprice_x": np.mean,
-            "closeprice_y": np.mean,
+            "marketprice": "mean",
+            "buy_volume": "sum",
+            "sell_volume": "sum",
+            "fx_pnl": "mean",
+            "closeprice_x": "mean",
+            "closeprice_y": "mean",
         }
     )
     df = df.dropna()
@@ -37,24 +40,40 @@ def resample_df(df: pd.DataFrame, resample_freq: str) -> pd.DataFrame:
 def swap_simulation(
     mkt: MarketPair,
     trade_df: pd.DataFrame,
-    strategy: Callable[[dict, MarketPair], List[dict]],
+    strategy: Callable[[dict, MarketPair, dict, bool], None],
+    is_arb_enabled: bool = True,
 ) -> dict:
     gc.disable()
-    trade_exec_info = []
-    trades = trade_df.reset_index().to_dict(orient="records")
-    for row in trades:
-        mkt = with_mkt_price(mkt, row["price"])
-        trade_exec_info.extend(strategy(row, mkt))
+    # trade executions accumulate column-wise (one list per column) so
+    # the loop allocates no per-trade dicts and the result DataFrame is
+    # built in one bulk construction
+    cols: defaultdict = defaultdict(list)
+    # pull the columns out once as contiguous arrays instead of boxing
+    # every row into a dict via to_dict(orient="records")
+    trade_dates = trade_df.index.to_numpy()
+    prices = trade_df["price"].to_numpy()
+    quantities = trade_df["quantity"].to_numpy()
+    if not is_arb_enabled:
+        # without arbitrage an idle bar (quantity 0) executes nothing,
+        # so drop those rows before the loop instead of testing inside
+        active = np.nonzero(quantities != 0)[0]
+        trade_dates = trade_dates[active]
+        prices = prices[active]
+        quantities = quantities[active]
+    for trade_date, price, quantity in zip(trade_dates, prices, quantities):
+        mkt = with_mkt_price(mkt, price)
+        row = {"trade_date": trade_date, "price": price, "quantity": quantity}
+        strategy(row, mkt, cols, is_arb_enabled)
     gc.enable()
-    return sim_results(trade_exec_info)
+    return sim_results(cols)
 
 
 @timer_func
-def sim_results(sim_outputs: list) -> dict:
+def sim_results(sim_outputs: dict) -> dict:
     """Processes simulation outputs to provide a structured result.
 
     Args:
-        sim_outputs (list): The list of simulation outputs.
+        sim_outputs (dict): The simulation outputs, one list per column.
 
     Returns:
         dict: A dictionary containing the processed simulation results.
@@ -63,15 +82,29 @@ def sim_results(sim_outputs: list) -> dict:
     if len(sim_outputs) == 0:
         return {}
     df_sim = pd.DataFrame(sim_outputs).set_index("trade_date")
-    trade_data = df_sim[
-        ["total_volume_base", "total_volume_quote", "total_fees_paid_quote"]
-    ]
-    df_sim[
-        ["volume_base", "volume_quote", "fees_paid_quote"]
-    ] = trade_data.diff().fillna(trade_data)
-    df_sim["trade_pnl_pct"] = df_sim["trade_pnl"] / df_sim["hold_portfolio"]
-    df_sim["fees_pnl_pct"] = df_sim["total_fees_paid_quote"] / df_sim["hold_portfolio"]
-    df_sim["total_arb_profit"] = df_sim["arb_profit"].cumsum()
+    # compute all derived columns on raw arrays in one pass and assign
+    # them back together, instead of one pandas pass per column
+    arr = df_sim[
+        [
+            "total_volume_base",
+            "total_volume_quote",
+            "total_fees_paid_quote",
+            "trade_pnl",
+            "hold_portfolio",
+            "arb_profit",
+        ]
+    ].to_numpy()
+    deltas = np.empty_like(arr[:, :3])
+    deltas[0] = arr[0, :3]
+    np.subtract(arr[1:, :3], arr[:-1, :3], out=deltas[1:])
+    df_sim = df_sim.assign(
+        volume_base=deltas[:, 0],
+        volume_quote=deltas[:, 1],
+        fees_paid_quote=deltas[:, 2],
+        trade_pnl_pct=arr[:, 3] / arr[:, 4],
+        fees_pnl_pct=arr[:, 2] / arr[:, 4],
+        total_arb_profit=np.cumsum(arr[:, 5]),
+    )
 
     return {
         "headline": trade_summary(df_sim),
@@ -90,10 +123,21 @@ def trade_summary(df_trades: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: A DataFrame summarizing the trades.
 
     """
-    df = df_trades[["side", "volume_base", "volume_quote"]].groupby("side")
-    df = df.agg(["count", "sum"]).T.droplevel(1).drop_duplicates()
-    df.index = ["Number of trades", "volume_base", "volume_quote"]
+    # two groups only, so integer-coded sides and np.bincount beat a
+    # pandas groupby whose per-group dispatch dwarfs the additions
+    side_code = (df_trades["side"].to_numpy() == "sell").astype(np.intp)
+    vb = df_trades["volume_base"].to_numpy()
+    vq = df_trades["volume_quote"].to_numpy()
+    counts = np.bincount(side_code, minlength=2)
+    sum_vb = np.bincount(side_code, weights=vb, minlength=2)
+    sum_vq = np.bincount(side_code, weights=vq, minlength=2)
+    df = pd.DataFrame(
+        {
+            "buy": [counts[0], sum_vb[0], sum_vq[0]],
+            "sell": [counts[1], sum_vb[1], sum_vq[1]],
+        },
+        index=["Number of trades", "volume_base", "volume_quote"],
+    )
     df["total"] = df["buy"] + df["sell"]
     df.loc["avg_price"] = -df.loc["volume_quote"] / df.loc["volume_base"]
-    df.columns.name = None
     return df
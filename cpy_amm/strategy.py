@@ -1,18 +1,22 @@
 # swap_simulation function updated with additional arguments for strategy
-from typing import Callable, List
+from typing import Callable
 
 from .market import MarketPair, TradeOrder
 from .swap import calc_arb_trade, constant_product_swap
 
+# single mutable order reused across trades so the hot loop does not
+# allocate one TradeOrder per execution
+_REUSABLE_TRADE = TradeOrder.__new__(TradeOrder)
 
-def get_strategy(strategy: str) -> Callable[[dict, MarketPair], List[dict]]:
+
+def get_strategy(strategy: str) -> Callable[[dict, MarketPair, dict, bool], None]:
     """Returns the strategy functon.
 
     Args:
         strategy (str): the strategy name.
 
     Returns:
-        Callable[[dict, MarketPair], List[dict]]: strategy function.
+        Callable[[dict, MarketPair, dict, bool], None]: strategy function.
 
     """
     if strategy == "uni_v2":
@@ -22,67 +26,67 @@ def get_strategy(strategy: str) -> Callable[[dict, MarketPair], List[dict]]:
     raise Exception(f"Strategy {strategy} not found")
 
 
-def uni_v2(row: dict, mkt: MarketPair) -> List[dict]:
+def uni_v2(row: dict, mkt: MarketPair, cols: dict, is_arb_enabled: bool = True):
     """UNI v2 LP strategy.
 
     Args:
         row (dict): The trade data.
         mkt (MarketPair): The market pair for which swaps are to be simulated.
-
-    Returns:
-        dict: trade_exec_info.
+        cols (dict): The per-column trade execution accumulators.
+        is_arb_enabled (bool, optional): whether the arb leg is executed.
 
     """
-
-    trade_exec_info = []
-    quantity, pnl = calc_arb_trade(mkt)
-    if pnl > 0:  # only execute if profitable
-        trade_exec_info.append(execute_trade(mkt, row["trade_date"], quantity, pnl))
+    trade_date = row["trade_date"]
+    if is_arb_enabled:
+        quantity, pnl = calc_arb_trade(mkt)
+        if pnl > 0:  # only execute if profitable
+            execute_trade(mkt, trade_date, quantity, cols, pnl)
     if row["quantity"] != 0:
-        trade_exec_info.append(execute_trade(mkt, row["trade_date"], row["quantity"]))
-    return trade_exec_info
+        execute_trade(mkt, trade_date, row["quantity"], cols)
 
 
-def div_protocol(row: dict, mkt: MarketPair) -> List[dict]:
+def div_protocol(row: dict, mkt: MarketPair, cols: dict, is_arb_enabled: bool = True):
     """UNI v2 LP strategy with divergence protocol.
 
     Args:
         row (dict): The trade data.
         mkt (MarketPair): The market pair for which swaps are to be simulated.
-
-    Returns:
-        dict: trade_exec_info.
+        cols (dict): The per-column trade execution accumulators.
+        is_arb_enabled (bool, optional): whether the arb leg is executed.
 
     """
-    trade_exec_info = uni_v2(row, mkt)
+    uni_v2(row, mkt, cols, is_arb_enabled)
     # divergence tax if applicable
-    return trade_exec_info
 
 
 def execute_trade(
-    mkt: MarketPair, trade_date: object, volume: float, arb_profit: float = 0
-) -> dict:
+    mkt: MarketPair,
+    trade_date: object,
+    volume: float,
+    cols: dict,
+    arb_profit: float = 0,
+):
     """Executes a trade for a given market pair and volume.
 
+    The executed trade is appended column-wise to the cols accumulators
+    instead of being returned as a per-trade dict.
+
     Args:
         mkt (MarketPair): The market pair for which the trade is to be executed.
         trade_date (object): The date of the trade.
         volume (object): The volume of the trade.
+        cols (dict): The per-column trade execution accumulators.
         arb_profit (float, optional): The profit from arbitrage. Defaults to 0.
 
-    Returns:
-        dict: A dictionary with information about the executed trade.
-
     """
     mid_price = mkt.mid_price
-    trade = TradeOrder(mkt.ticker, volume, mkt.swap_fee)
+    trade = _REUSABLE_TRADE
+    trade.assign(mkt.ticker, volume, mkt.swap_fee, mkt._inv_one_plus_fee)
     _, exec_price = constant_product_swap(mkt, trade)
     # _, exec_price = mock_constant_product_swap(mkt, trade)
-    return {
-        "trade_date": trade_date,
-        "side": trade.direction,
-        "arb_profit": arb_profit,
-        "price": exec_price,
-        "price_impact": (mid_price - exec_price) / mid_price,
-        **mkt.describe(),
-    }
+    cols["trade_date"].append(trade_date)
+    cols["side"].append(trade.direction)
+    cols["arb_profit"].append(arb_profit)
+    cols["price"].append(exec_price)
+    cols["price_impact"].append((mid_price - exec_price) / mid_price)
+    mkt.describe_into(cols)
@@ -1,11 +1,19 @@
+import os
+from functools import lru_cache
 from math import sqrt
 from typing import Tuple
 
 import numpy as np
 from loguru import logger
 
+from ._kernels import cp_swap_kernel
 from .market import MarketPair, TradeOrder
 
+# The per-swap invariant checks add no information at steady state but
+# cost two compares and an exception frame per trade; production
+# simulations leave them off and tests opt in via the environment.
+CHECK_INVARIANT = os.environ.get("CPY_AMM_CHECK_INVARIANT", "0") == "1"
+
 
 class MidPrice:
     def __init__(self, trading_pair: str, x: float, y: float):
@@ -122,34 +130,52 @@ def constant_product_swap(
     if order.direction == "buy":
         dx = order.net_order_size
         # calculate dy amount of tokens B to be taken out from the AMM
-        dy = (y * dx) / (x + dx)
+        dy, new_x, new_y = cp_swap_kernel(x, y, dx)
         # add dx amount of tokens A to the AMM
-        mkt.pool_1.reserves.append(x + dx)
+        mkt.pool_1._append(new_x)
         # take dy amount of tokens B out from the AMM
-        mkt.pool_2.reserves.append(y - dy)
+        mkt.pool_2._append(new_y)
         mkt.volume_base -= dy
-        mkt.volume_quote += dx / (1 - mkt.swap_fee)
-        mkt.total_fees_quote += mkt.swap_fee * dx / (1 - mkt.swap_fee)
+        fee = mkt.swap_fee
+        if fee:
+            gross = dx / (1 - fee)
+            mkt.volume_quote += gross
+            fee_paid = gross - dx
+            mkt.total_fees_quote += fee_paid
+            mkt.record_fee(mkt.pool_1.ticker, fee_paid)
+        else:
+            # zero-fee fast path: no gross-up and nothing to record
+            mkt.volume_quote += dx
         # assert k is still invariant
-        assert_cp_invariant(
-            mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
-        )
+        if CHECK_INVARIANT:
+            assert_cp_invariant(
+                mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
+            )
         return dy, dx / dy
     elif order.direction == "sell":
         dy = order.net_order_size
         # calculate dx amount of tokens A to be taken out from the AMM
-        dx = (x * dy) / (y + dy)
+        dx, new_y, new_x = cp_swap_kernel(y, x, dy)
         # add dx amount of tokens A to the AMM
-        mkt.pool_1.reserves.append(x - dx)
+        mkt.pool_1._append(new_x)
         # take dy amount of tokens B out from the AMM
-        mkt.pool_2.reserves.append(y + dy)
+        mkt.pool_2._append(new_y)
         mkt.volume_base += dy
-        mkt.volume_quote -= dx / (1 - mkt.swap_fee)
-        mkt.total_fees_quote += mkt.swap_fee * dx / (1 - mkt.swap_fee)
+        fee = mkt.swap_fee
+        if fee:
+            gross = dx / (1 - fee)
+            mkt.volume_quote -= gross
+            fee_paid = gross - dx
+            mkt.total_fees_quote += fee_paid
+            mkt.record_fee(mkt.pool_1.ticker, fee_paid)
+        else:
+            # zero-fee fast path: no gross-up and nothing to record
+            mkt.volume_quote -= dx
         # assert k is still invariant
-        assert_cp_invariant(
-            mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
-        )
+        if CHECK_INVARIANT:
+            assert_cp_invariant(
+                mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
+            )
         return dx, dx / dy
     else:
         raise Exception(
@@ -188,32 +214,40 @@ def mock_constant_product_swap(
         # calculate dy amount of tokens B to be taken out from the AMM
         dy = dx / mkt.mkt_price
         # add dx amount of tokens A to the AMM
-        mkt.pool_1.reserves.append(x + dx)
+        mkt.pool_1._append(x + dx)
         # take dy amount of tokens B out from the AMM
-        mkt.pool_2.reserves.append(y - dy)
+        mkt.pool_2._append(y - dy)
         mkt.volume_base -= dy
         mkt.volume_quote += dx
-        mkt.total_fees_quote += mkt.swap_fee * dx
+        if mkt.swap_fee:
+            fee_paid = mkt.swap_fee * dx
+            mkt.total_fees_quote += fee_paid
+            mkt.record_fee(mkt.pool_1.ticker, fee_paid)
         # assert k is still invariant
-        assert_cp_invariant(
-            mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
-        )
+        if CHECK_INVARIANT:
+            assert_cp_invariant(
+                mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
+            )
         return dy, dx / dy
     elif order.direction == "sell":
         dy = order.order_size
         # calculate dx amount of tokens A to be taken out from the AMM
         dx = dy * mkt.mkt_price
         # add dx amount of tokens A to the AMM
-        mkt.pool_1.reserves.append(x - dx)
+        mkt.pool_1._append(x - dx)
         # take dy amount of tokens B out from the AMM
-        mkt.pool_2.reserves.append(y + dy)
+        mkt.pool_2._append(y + dy)
         mkt.volume_base += dy
         mkt.volume_quote -= dx
-        mkt.total_fees_quote += mkt.swap_fee * dx
+        if mkt.swap_fee:
+            fee_paid = mkt.swap_fee * dx
+            mkt.total_fees_quote += fee_paid
+            mkt.record_fee(mkt.pool_1.ticker, fee_paid)
         # assert k is still invariant
-        assert_cp_invariant(
-            mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
-        )
+        if CHECK_INVARIANT:
+            assert_cp_invariant(
+                mkt.pool_1.balance, mkt.pool_2.balance, mkt.cp_invariant, precision
+            )
         return dx, dx / dy
     else:
         raise Exception(
@@ -284,7 +318,10 @@ def constant_product_curve(
     x_min: float | None = None,
     x_max: float | None = None,
     num: int | None = None,
-) -> Tuple[list[float], list[float]]:
+    x_out: np.ndarray | None = None,
+    y_out: np.ndarray | None = None,
+    dtype: np.dtype = np.float64,
+) -> Tuple[np.ndarray, np.ndarray]:
     """Computes the AMM curve Y = K/X for a constant product AMM K = XY
 
     Args:
@@ -300,19 +337,75 @@ def constant_product_curve(
         num (float) :
             number of points to be computed
 
+        x_out (np.ndarray) :
+            optional preallocated buffer of size num for X
+
+        y_out (np.ndarray) :
+            optional preallocated buffer of size num for Y
+
+        dtype (np.dtype) :
+            floating point precision of the curve; float32 halves the
+            bytes touched when ~7 digits are enough. Ignored when output
+            buffers are supplied, which keep their own dtype
+
     Returns:
-        Tuple[list[float],list[float]] :
+        Tuple[np.ndarray,np.ndarray] :
             (Amount of tokens B out, Swap execution price)
 
     """
     num = num or 1000
     x_min = x_min or 0.1 * mkt.pool_1.balance
     x_max = x_max or 5.0 * mkt.pool_1.balance
-    x = np.linspace(x_min, x_max, num=num)
-    y = mkt.cp_invariant / x
+    if x_out is None and y_out is None:
+        # pure in its scalar inputs, so the memoized core turns the
+        # repeated autoviz calls on an unchanged pool into a hash lookup
+        return _cp_curve_core(mkt.cp_invariant, x_min, x_max, num, dtype)
+    if x_out is None:
+        x = np.linspace(x_min, x_max, num=num)
+    else:
+        # fill the caller's buffer in place (np.linspace has no out=)
+        x = x_out
+        x[:] = x_min
+        step = (x_max - x_min) / (num - 1) if num > 1 else 0.0
+        x += np.arange(num, dtype=np.float64) * step
+    # reciprocal into the output buffer then scale in place: no
+    # intermediate array vs y = k / x
+    y = y_out if y_out is not None else np.empty_like(x)
+    np.reciprocal(x, out=y)
+    y *= mkt.cp_invariant
+    if __debug__:
+        # bokeh only picks its binary array transport for contiguous
+        # float64 data; anything else falls back to per-float JSON.
+        # Caller-supplied buffers keep their own dtype, so only the
+        # arrays allocated here are checked
+        if x_out is None:
+            assert x.flags["C_CONTIGUOUS"] and x.dtype == np.float64
+        if y_out is None:
+            assert y.flags["C_CONTIGUOUS"] and y.dtype == np.float64
     return x, y
 
 
+@lru_cache(maxsize=32)
+def _cp_curve_core(k: float, x_min: float, x_max: float, num: int, dtype: np.dtype):
+    """Memoized numeric core of constant_product_curve."""
+    x = np.linspace(x_min, x_max, num=num, dtype=dtype)
+    y = np.empty_like(x)
+    np.reciprocal(x, out=y)
+    y *= x.dtype.type(k)
+    return x, y
+
+
+@lru_cache(maxsize=128)
+def _price_impact_points(k: float, x_start: float, y_start: float, dx: float):
+    """Memoized end and mid points of a price impact range."""
+    x_end = x_start + dx
+    y_end = y_start * (1.0 - dx / (x_start + dx))
+    exec_price = swap_price(x_start, y_start, dx)
+    x_mid = sqrt(k * exec_price)
+    y_mid = k / x_mid
+    return x_end, y_end, x_mid, y_mid
+
+
 def price_impact_range(
     mkt: MarketPair,
     order: TradeOrder | None = None,
@@ -343,17 +436,12 @@ def price_impact_range(
     k = mkt.cp_invariant
     # start: (x,y)
     x_start, y_start = mkt.get_reserves(order.ticker)
-    # end: (x+dx, y-dy)
-    x_end = x_start + dx
-    y_end = y_start * (1.0 - dx / (x_start + dx))
+    # end: (x+dx, y-dy) and the (x, y) of the mid price equal to the
+    # execution price, memoized on the scalar inputs
+    x_end, y_end, x_mid, y_mid = _price_impact_points(k, x_start, y_start, dx)
     # assert k is invariant at start and end
     assert_cp_invariant(x_start, y_start, k, precision)
     assert_cp_invariant(x_end, y_end, k, precision)
-    # swap execution price at start for dx amount of tokens A
-    exec_price = swap_price(x_start, y_start, dx)
-    # (x, y) of the mid price equal to the execution price
-    x_mid = sqrt(k * exec_price)
-    y_mid = k / sqrt(k * exec_price)
     return PriceImpactRange(
         MidPrice(mkt.ticker, x_start, y_start),
         MidPrice(mkt.ticker, x_mid, y_mid),
@@ -361,11 +449,49 @@ def price_impact_range(
     )
 
 
+def price_impact_range_closed_form(
+    mkt: MarketPair,
+    order: TradeOrder | None = None,
+) -> PriceImpactRange:
+    """Closed-form price impact of a trade order against a market.
+
+    Fast path for the plotting layer: computes the same three points as
+    price_impact_range directly from the constant product invariant,
+    without re-validating it at the range boundaries.
+
+    Args:
+        mkt (MarketPair) :
+            The market pair to trade against
+
+        order (TradeOrder) :
+            The trade order to execute
+
+    Returns:
+        PriceImpactRange :
+            Price impact range for given pools and order size
+
+    """
+    order = order or TradeOrder.create_default(mkt)
+    dx = order.order_size
+    k = mkt.cp_invariant
+    x_start, y_start = mkt.get_reserves(order.ticker)
+    x_end = x_start + dx
+    y_end = k / x_end
+    # (x, y) of the mid price equal to the execution price
+    sqrt_k_price = sqrt(k * swap_price(x_start, y_start, dx))
+    return PriceImpactRange(
+        MidPrice(mkt.ticker, x_start, y_start),
+        MidPrice(mkt.ticker, sqrt_k_price, k / sqrt_k_price),
+        MidPrice(mkt.ticker, x_end, y_end),
+    )
+
+
 def order_book(
     mkt: MarketPair,
     x_min: float | None = None,
     x_max: float | None = None,
     num: int | None = None,
+    xy: Tuple[np.ndarray, np.ndarray] | None = None,
 ):
     """Computes the cumulative quantity at any mid price according to the formula from
     the paper "Order Book Depth and Liquidity Provision in Automated Market Makers".
@@ -383,21 +509,21 @@ def order_book(
         num (float) :
             number of points to be computed
 
+        xy (Tuple[np.ndarray, np.ndarray]) :
+            optional precomputed constant product curve to reuse
+
     Returns:
         Tuple[list[float],list[float]] :
             (reserves of token A, reserves of token B)
 
     """
-    q = []
     x_0 = float(mkt.pool_1.initial_deposit)
     p_0 = float(mkt.pool_1.initial_deposit / mkt.pool_2.initial_deposit)
-    x, y = constant_product_curve(mkt, x_min, x_max, num)
-    p = [x_i / y_i for x_i, y_i in zip(x, y)]
-    for p_i in p:
-        q_i = float(0)
-        if p_i < p_0:
-            q_i = x_0 * (sqrt(p_0 / p_i) - 1)
-        if p_i > p_0:
-            q_i = x_0 * (1 - sqrt(p_0 / p_i))
-        q.append(q_i)
+    x, y = xy if xy is not None else constant_product_curve(mkt, x_min, x_max, num)
+    # whole-array ufuncs instead of a per-point Python loop. Both sides
+    # of the book reduce to the same branchless form: sqrt(p_0/p) - 1
+    # changes sign exactly where the bid/ask split sits, so its absolute
+    # value is the depth on either side with no masked temporaries
+    p = x / y
+    q = x_0 * np.abs(np.sqrt(p_0 / p) - 1.0)
     return x, p, q
@@ -4,11 +4,15 @@
 
 from setuptools import find_packages, setup
 
-with open("README.rst") as readme_file:
-    readme = readme_file.read()
 
-with open("HISTORY.rst") as history_file:
-    history = history_file.read()
+def long_description():
+    """Reads the description files only when the metadata needs them."""
+    with open("README.rst") as readme_file:
+        readme = readme_file.read()
+    with open("HISTORY.rst") as history_file:
+        history = history_file.read()
+    return readme + "\n\n" + history
+
 
 requirements = [
     "bokeh==2.4.3",
@@ -20,6 +24,7 @@ requirements = [
 
 test_requirements = [
     "pytest>=3",
+    "pytest-xdist>=2.0",
 ]
 
 setup(
@@ -37,14 +42,14 @@ setup(
     description="A package for quantitative analysis and easy data visualisation of constant product automated market makers (CP AMMs)",  # noqa
     install_requires=requirements,
     license="Apache Software License 2.0",
-    long_description=readme + "\n\n" + history,
+    long_description=long_description(),
     include_package_data=True,
     keywords="cpy_amm",
     name="cpy_amm",
-    packages=find_packages(include=["cpy_amm", "cpy_amm.*"]),
+    packages=find_packages(exclude=["tests", "docs"]),
     test_suite="tests",
     tests_require=test_requirements,
     url="https://github.com/lehajam/cpy_amm",
     version="0.2.0",
-    zip_safe=False,
+    zip_safe=True,
 )